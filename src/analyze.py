@@ -5,6 +5,16 @@ import logging
 import datetime as dt
 import pandas as pd
 import shutil
+import xlsxwriter
+from collections import Counter
+import tempfile
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # windows
+    fcntl = None
+    import msvcrt
 
 from logger import logger
 from day import Day
@@ -21,6 +31,57 @@ BACKUP_PATH: str = os.path.realpath(os.path.join(
     os.path.dirname(ANALYSIS_FILE_PATH),
     "backups"
 ))
+EXPORT_FILE_PATH: str = os.path.realpath(os.path.join(
+    os.path.dirname(ANALYSIS_FILE_PATH), "export.xlsx"))
+# columns of the storage holding the courses
+COURSES: Tuple[str, ...] = ("soup", "main", "dessert", "dinner")
+# lock file guarding the storage file against concurrent writers
+LOCK_FILE_PATH: str = ANALYSIS_FILE_PATH + ".lock"
+
+
+@contextmanager
+def storage_lock():
+    """
+    Holds an exclusive inter-process lock on the storage file
+    while the context is active. Blocks until the lock is acquired.
+    """
+    os.makedirs(os.path.dirname(LOCK_FILE_PATH), exist_ok=True)
+    with open(LOCK_FILE_PATH, "a+b") as lock_file:
+        logger.debug("acquiring storage lock")
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        else:
+            lock_file.seek(0)
+            # LK_LOCK only retries for 10 seconds, keep trying
+            while True:
+                try:
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    pass
+
+        try:
+            yield
+        finally:
+            logger.debug("releasing storage lock")
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def get_storage_version() -> Optional[Tuple[int, int, int]]:
+    """
+    Returns a token that changes whenever the storage file is
+    replaced (inode, mtime in ns and size), None if it does not exist.
+    """
+    try:
+        stat: os.stat_result = os.stat(ANALYSIS_FILE_PATH)
+    except FileNotFoundError:
+        return None
+
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
 
 
 def get_storage() -> pd.DataFrame:
@@ -41,7 +102,9 @@ def get_storage() -> pd.DataFrame:
         logger.debug("reading from excel")
         df: pd.DataFrame = pd.read_excel(ANALYSIS_FILE_PATH, index_col='date')
 
-        df = df.astype(dtypes)
+        # empty cells are NaN, which astype(str) turns into "nan" in
+        # older pandas and keeps as NaN in newer ones, use "none" like Day
+        df = df.fillna("none").astype(dtypes)
 
         return df
 
@@ -67,19 +130,90 @@ def get_storage() -> pd.DataFrame:
 
 def write_storage(df: pd.DataFrame) -> None:
     """
-    Writes the given dataframe into analysis/analysis.xlsx.
+    Writes the given dataframe into analysis/storage.xlsx.
     It will also create a backup file named with its creation 
     time to prevent data loss.
+    The write holds the storage lock and is atomic, readers either
+    see the old or the new file, never a half written one.
+    Kept as public API for writing a whole edited dataframe (e.g. after
+    manual corrections), importers should use update_storage.
+    """
+    with storage_lock():
+        _write_storage_locked(df)
+
+
+def update_storage(days: List[Day]) -> pd.DataFrame:
+    """
+    Adds the days to the storage and writes it back. Safe to run
+    from several processes at once: if the storage was changed by
+    another process after it was read, it is read again and the
+    days are applied on top of the new version before writing.
+    Returns the written dataframe.
+    """
+    version: Optional[Tuple[int, int, int]] = get_storage_version()
+    df: pd.DataFrame = get_storage()
+
+    for day in days:
+        df = add_day(df, day)
+
+    with storage_lock():
+        if get_storage_version() != version:
+            logger.info("storage changed while adding days, merging")
+            print("storage was changed by another process, merging")
+            df = get_storage()
+            for day in days:
+                df = add_day(df, day)
+
+        _write_storage_locked(df)
+
+    return df
+
+
+def _file_mode(path: str) -> int:
+    """
+    Returns the mode for a temp file that will replace path. mkstemp
+    creates files with 0600, keep the mode of the existing file (or
+    the umask default) so others can still read it.
+    """
+    try:
+        return os.stat(path).st_mode & 0o777
+    except FileNotFoundError:
+        umask: int = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+def _write_storage_locked(df: pd.DataFrame) -> None:
+    """
+    Does the actual writing of write_storage, the storage lock
+    has to be held by the caller.
     """
     # BACKUP_PATH exists, BACKUP_PATH is a path to a dir
     if not os.path.exists(BACKUP_PATH):
         logger.debug("backup path not existing, creating dirs to backup path")
         os.makedirs(BACKUP_PATH)
 
-    # override old excel file
-    with pd.ExcelWriter(ANALYSIS_FILE_PATH, engine='xlsxwriter') as writer:
-        logger.debug("writing to storage file...")
-        df.to_excel(writer, index=True, index_label="date")
+    # write to a temp file in the same directory, so the rename
+    # below does not cross file systems and stays atomic
+    fd, tmp_path = tempfile.mkstemp(
+        suffix=".xlsx", prefix=".storage-",
+        dir=os.path.dirname(ANALYSIS_FILE_PATH))
+    os.close(fd)
+
+    try:
+        os.chmod(tmp_path, _file_mode(ANALYSIS_FILE_PATH))
+
+        with pd.ExcelWriter(tmp_path, engine='xlsxwriter') as writer:
+            logger.debug("writing to temporary storage file...")
+            df.to_excel(writer, index=True, index_label="date")
+
+        # override old excel file
+        logger.debug("replacing storage file")
+        os.replace(tmp_path, ANALYSIS_FILE_PATH)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
 
     logger.debug("creating backup")
     # create backup of new excel file
@@ -92,6 +226,67 @@ def write_storage(df: pd.DataFrame) -> None:
     )
 
 
+def export_storage(df: pd.DataFrame, path: str = EXPORT_FILE_PATH) -> None:
+    """
+    Exports the dataframe into a workbook for reading, with a summary
+    sheet and one sheet per year. Uses the constant memory mode of
+    xlsxwriter, so rows are streamed to disk and memory stays bounded
+    no matter how long the history is. In this mode rows have to be
+    written in order, sheet by sheet.
+    """
+    df = df.sort_index()
+    columns: List[str] = ["soup", "main", "dessert", "dinner", "comment"]
+
+    # unique temp file next to the export, see _write_storage_locked
+    fd, tmp_path = tempfile.mkstemp(
+        suffix=".xlsx", prefix=".export-", dir=os.path.dirname(path))
+    os.close(fd)
+
+    try:
+        os.chmod(tmp_path, _file_mode(path))
+
+        workbook = xlsxwriter.Workbook(tmp_path, {"constant_memory": True})
+        bold = workbook.add_format({"bold": True})
+        date_format = workbook.add_format({"num_format": "yyyy-mm-dd"})
+
+        logger.debug("writing summary sheet")
+        summary = workbook.add_worksheet("summary")
+        summary.write_row(0, 0, ["year", "days", "days served", "different soups",
+                                 "different mains", "most common soup",
+                                 "most common main"], bold)
+        years = df.groupby(df.index.year)
+        for row, (year, days) in enumerate(years, start=1):
+            served: pd.DataFrame = days[days["soup"] != "none"]
+            soups: Counter = Counter(served["soup"])
+            mains: Counter = Counter(
+                main.strip() for mains in served["main"] for main in mains.split(";"))
+            summary.write_row(row, 0, [
+                int(year),
+                len(days),
+                len(served),
+                len(soups),
+                len(mains),
+                soups.most_common(1)[0][0] if soups else "",
+                mains.most_common(1)[0][0] if mains else "",
+            ])
+
+        for year, days in years:
+            logger.debug(f"writing sheet for {year}")
+            sheet = workbook.add_worksheet(str(year))
+            sheet.write_row(0, 0, ["date"] + columns, bold)
+            sheet.set_column(0, 0, 12)
+            for row, day in enumerate(days[columns].itertuples(), start=1):
+                sheet.write_datetime(row, 0, day[0].to_pydatetime(), date_format)
+                sheet.write_row(row, 1, day[1:])
+
+        workbook.close()
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
 def add_day(df: pd.DataFrame, day: Day) -> pd.DataFrame:
     """
     Adds the day as a new row to the dataframe
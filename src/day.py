@@ -19,6 +19,10 @@ class Day:
         (see format in pdf.py get_days())
         """
         self._text: Optional[List[str]] = None
+        # which heuristic of _get_main was used, for statistics (see replay.py)
+        self.lunch_branch: Optional[str] = None
+        # True if _get_dinner had to fall back to splitting at a single space
+        self.dinner_fallback: bool = False
         self.soup: str
         self.main: List[str]
         self.dessert: str
@@ -31,6 +35,7 @@ class Day:
         # 4 = 1 soup + dinner, 2 for 2 main courses, 1 for dessert
         if len(text) < 4:
             self.comment = ">>".join(text)
+            self.lunch_branch = "no-school"
 
             self.soup: Optional[str] = "none"
             self.main: Optional[List[str]] = ["none"]
@@ -59,7 +64,12 @@ class Day:
             self.dinner = self._get_dinner()
 
     @staticmethod
-    def get_weekdays(week: List[List[str]], start_date: dt.datetime) -> List[Day]:
+    def get_weekdays(week: List[List[str]], start_date: dt.datetime,
+                     skipped: Optional[List[dt.datetime]] = None) -> List[Day]:
+        """
+        Creates a Day for every day in the week. Days that can not be
+        parsed are skipped, their dates are appended to skipped if given.
+        """
         day_week: List[Day] = []
         date: dt.datetime = start_date
         for day in week:
@@ -69,6 +79,8 @@ class Day:
                 print(f"{date.strftime('%d%m%Y was skipped! (ValueError)')}")
                 logger.warning(
                     f"{date.strftime('%d%m%Y was skipped! (ValueError)')}")
+                if skipped is not None:
+                    skipped.append(date)
             date = date + dt.timedelta(days=1)
 
         return day_week
@@ -92,6 +104,7 @@ class Day:
         except IndexError:
             # fallback for when dinner is not seperated by two spaces
             logger.warning(f"DINNER COULD NOT BE SEPERATED! text={self._text}")
+            self.dinner_fallback = True
             dinner: str = self._text[0].split(" ")[-1].strip()
 
         # get middle lines of dinner (full lines)
@@ -129,6 +142,8 @@ class Day:
         # the line before the last line
         lunch_slice: List[str] = self._text[start_index:len(self._text) - 1]
 
+        self.lunch_branch = f"lines-{len(lunch_slice)}"
+
         # SOMEHOW KNOW WHICH LINES BELONG TO THE SAME MEAL
         if len(lunch_slice) == 2:
             # 2 lines just represent the two meals
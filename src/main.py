@@ -1,15 +1,13 @@
-from typing import List, Tuple, Dict, Optional
+from typing import List
 import os
 import sys
-import logging
 import requests
-import datetime as dt
 import pandas as pd
 
 from logger import logger
-from pdf import get_days, save_new_pdf, read_date
+from pdf import get_days, save_new_pdf
 from day import Day
-from analyze import get_storage, write_storage, add_day
+from analyze import get_storage, update_storage, export_storage, EXPORT_FILE_PATH
 
 
 def get_files_in_directory(directory: str) -> List[str]:
@@ -28,27 +26,9 @@ def add_to_storage_routine(pdf_path: str):
     print(f"Importing data from {pdf_path}.")
     days: List[Day] = get_days(pdf_path)
 
-    logger.info(f"retrieving storage...")
-    df: pd.DataFrame = get_storage()
-
-    logger.info(f"Adding new data")
-    for day in days:
-        df = add_day(df, day)
-
-    logger.info(f"Writing new dataframe to storage")
+    logger.info(f"Adding new data and writing to storage")
     print("writing to storage")
-    write_storage(df)
-
-
-def add_to_df(df: pd.DataFrame, pdf_path: str) -> pd.DataFrame:
-    print(f"Importing data from {pdf_path}.")
-    days: List[Day] = get_days(pdf_path)
-
-    logger.info(f"Adding new data")
-    for day in days:
-        df = add_day(df, day)
-
-    return df
+    return update_storage(days)
 
 
 def main():
@@ -61,7 +41,14 @@ def main():
 Execute this script to get the current menu plan of the htl mödling and
 store it in the stored-menus directory. It then analyses the soup, lunch, dessert
 and dinner based on the menus collected so far. Supply a path to an existing menu
-as a command line argument to import the data from it into the analysis.""")
+as a command line argument to import the data from it into the analysis.
+Use -e or --export to write the storage to analysis/export.xlsx with
+one sheet per year and a summary sheet.""")
+
+        elif sys.argv[1] in ("-e", "--export"):
+            logger.info(f"exporting storage to {EXPORT_FILE_PATH}")
+            print(f"exporting storage to {EXPORT_FILE_PATH}")
+            export_storage(get_storage())
 
         elif os.path.exists(sys.argv[1]):
             if os.path.isfile(sys.argv[1]):
@@ -84,7 +71,7 @@ as a command line argument to import the data from it into the analysis.""")
                 print(f"IMPORTING ALL MENUS FROM {sys.argv[1]}")
                 logger.info(f"IMPORTING ALL MENUS FROM {sys.argv[1]}")
 
-                df: pd.DataFrame = get_storage()
+                days: List[Day] = []
 
                 for file in files_in_dir:
                     logger.debug(f"importing menu from {file}")
@@ -93,12 +80,14 @@ as a command line argument to import the data from it into the analysis.""")
                     if not file.endswith(".pdf"):
                         continue
 
-                    df = add_to_df(df, file)
+                    print(f"Importing data from {file}.")
+                    days += get_days(file)
 
-                if df is not None:
-                    logger.info(f"Writing new dataframe to storage")
-                    print("writing to storage")
-                    write_storage(df)
+                # storage is only read and written once all pdfs are parsed,
+                # so concurrent imports only conflict for a short time
+                logger.info(f"Writing new data to storage")
+                print("writing to storage")
+                update_storage(days)
 
         else:
             logger.info("Wrong arguments")
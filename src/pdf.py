@@ -219,10 +219,11 @@ def split_weekdays(text: List[str]) -> List[List[str]]:
     return days
 
 
-def get_days(path: str) -> List[Day]:
+def get_days(path: str, skipped: Optional[List[dt.datetime]] = None) -> List[Day]:
     """
     Supply a path to a menu and you get
-    the text of the days.
+    the text of the days. Dates of days that could not
+    be parsed are appended to skipped if given.
     """
     # read the text
     text: str = read_pdf(path)
@@ -233,4 +234,4 @@ def get_days(path: str) -> List[Day]:
     # get the days
     week: List[List[str]] = split_weekdays(lines)
 
-    return Day.get_weekdays(week, read_date(path))
+    return Day.get_weekdays(week, read_date(path), skipped)
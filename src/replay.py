@@ -0,0 +1,248 @@
+from typing import List, Tuple, Dict, Optional
+import os
+import sys
+import json
+import time
+import argparse
+import datetime as dt
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from logger import logger
+from pdf import get_days
+from day import Day
+
+"""
+Replays the parser over the whole archive in stored-menus.
+Every pdf is parsed again (in parallel) and the resulting rows
+are compared against a snapshot of the expected rows. Reports
+parse times, which lunch heuristic each day took, dinner fallbacks,
+skipped days and the differences to the snapshot.
+
+Run `python replay.py --update` once to create the snapshot.
+"""
+
+MENU_PATH: str = os.path.realpath(os.path.join(
+    os.path.dirname(__file__), "..", "stored-menus"))
+SNAPSHOT_PATH: str = os.path.realpath(os.path.join(
+    os.path.dirname(__file__), "..", "analysis", "replay-snapshot.json"))
+
+
+def get_pdfs(directory: str) -> List[str]:
+    """
+    Returns the paths of all pdfs in the directory (recursive), sorted.
+    """
+    pdfs: List[str] = []
+    for root, dirs, files in os.walk(directory):
+        for file in files:
+            if file.endswith(".pdf"):
+                pdfs.append(os.path.join(root, file))
+
+    return sorted(pdfs)
+
+
+def replay_file(path: str) -> Dict[str, object]:
+    """
+    Parses a single pdf and returns its rows and statistics.
+    Runs in a worker process, so everything returned is plain data.
+    """
+    skipped: List[dt.datetime] = []
+    start: float = time.perf_counter()
+    try:
+        days: List[Day] = get_days(path, skipped)
+    except Exception as e:
+        logger.warning(f"replay of {path} failed: {e!r}")
+        return {
+            "path": path,
+            "seconds": time.perf_counter() - start,
+            "error": repr(e),
+            "rows": {},
+            "branches": {},
+            "dinner_fallbacks": 0,
+            "skipped": [],
+        }
+    seconds: float = time.perf_counter() - start
+
+    return {
+        "path": path,
+        "seconds": seconds,
+        "error": None,
+        "rows": {day.date.strftime("%Y-%m-%d"): day.description for day in days},
+        "branches": {day.date.strftime("%Y-%m-%d"): day.lunch_branch for day in days},
+        "dinner_fallbacks": sum(day.dinner_fallback for day in days),
+        "skipped": [date.strftime("%Y-%m-%d") for date in skipped],
+    }
+
+
+def replay(paths: List[str], directory: str,
+           jobs: Optional[int] = None) -> List[Dict[str, object]]:
+    """
+    Parses all the pdfs in parallel, results are in the order of paths.
+    Each result is named by its path relative to directory, which is
+    also the key in the snapshot.
+    """
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        results: List[Dict[str, object]] = list(executor.map(replay_file, paths))
+
+    for result in results:
+        result["name"] = os.path.relpath(
+            result["path"], directory).replace(os.sep, "/")
+
+    return results
+
+
+def snapshot_rows(result: Dict[str, object]) -> Dict[str, Dict[str, str]]:
+    """
+    Returns the rows of a result as stored in the snapshot, the
+    description of each day plus the lunch heuristic it took.
+    """
+    return {date: {**row, "lunch_branch": result["branches"][date]}
+            for date, row in result["rows"].items()}
+
+
+def read_snapshot(path: str) -> Dict[str, Dict[str, Dict[str, str]]]:
+    """
+    Snapshot format: {path relative to the menu directory:
+                      {date: description + lunch_branch}}
+    """
+    if not os.path.exists(path):
+        return {}
+
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def write_snapshot(path: str, results: List[Dict[str, object]]) -> None:
+    snapshot: Dict[str, Dict[str, Dict[str, str]]] = {
+        result["name"]: snapshot_rows(result)
+        for result in results if result["error"] is None
+    }
+    tmp_path: str = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(snapshot, file, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def diff_rows(expected: Dict[str, Dict[str, str]],
+              actual: Dict[str, Dict[str, str]]) -> List[str]:
+    """
+    Returns a human readable line for every difference between
+    the expected and the actual rows of one file.
+    """
+    diffs: List[str] = []
+    for date in sorted(set(expected) | set(actual)):
+        if date not in actual:
+            diffs.append(f"{date}: missing")
+        elif date not in expected:
+            diffs.append(f"{date}: new")
+        else:
+            for column in expected[date]:
+                if expected[date][column] != actual[date].get(column):
+                    diffs.append(
+                        f"{date} {column}: {expected[date][column]!r} -> {actual[date].get(column)!r}")
+
+    return diffs
+
+
+def report(results: List[Dict[str, object]],
+           snapshot: Dict[str, Dict[str, Dict[str, str]]],
+           verbose: bool = False) -> int:
+    """
+    Prints the report and returns the number of files that
+    differ from the snapshot or failed to parse. If verbose,
+    the lunch heuristic of every day is printed as well.
+    """
+    branches: Counter = Counter()
+    parsed_days: int = 0
+    skipped_days: int = 0
+    dinner_fallbacks: int = 0
+    failed_files: int = 0
+
+    print("per file:")
+    for result in results:
+        name: str = result["name"]
+        branches.update(result["branches"].values())
+        parsed_days += len(result["rows"])
+        skipped_days += len(result["skipped"])
+        dinner_fallbacks += result["dinner_fallbacks"]
+
+        line: str = f"  {result['seconds'] * 1000:8.1f} ms  {name}"
+        if result["error"] is not None:
+            line += f"  ERROR {result['error']}"
+        elif result["skipped"]:
+            line += f"  skipped {', '.join(result['skipped'])}"
+        print(line)
+
+        if verbose:
+            for date, branch in sorted(result["branches"].items()):
+                print(f"      {date}  {branch}")
+
+        if result["error"] is not None:
+            failed_files += 1
+        elif name in snapshot:
+            diffs: List[str] = diff_rows(snapshot[name], snapshot_rows(result))
+            if diffs:
+                failed_files += 1
+                for diff in diffs:
+                    print(f"      {diff}")
+        elif snapshot:
+            print("      not in snapshot")
+
+    total_days: int = parsed_days + skipped_days
+    times: List[float] = sorted(result["seconds"] for result in results)
+
+    print()
+    print(f"files:            {len(results)} ({failed_files} failed or differing)")
+    if times:
+        print(f"parse time:       total {sum(times):.2f} s, "
+              f"median {times[len(times) // 2] * 1000:.1f} ms, max {times[-1] * 1000:.1f} ms")
+    print(f"days:             {total_days}")
+    if total_days:
+        print(f"skipped days:     {skipped_days} ({skipped_days / total_days:.1%})")
+    if parsed_days:
+        print(f"dinner fallbacks: {dinner_fallbacks} ({dinner_fallbacks / parsed_days:.1%})")
+    print("lunch branches:")
+    for branch, count in sorted(branches.items()):
+        print(f"  {branch:<10} {count:5} ({count / parsed_days:.1%})")
+
+    return failed_files
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Re-parse all stored menus and compare them to a snapshot.")
+    parser.add_argument("directory", nargs="?", default=MENU_PATH,
+                        help="directory containing the pdfs (default: stored-menus)")
+    parser.add_argument("--snapshot", default=SNAPSHOT_PATH,
+                        help="path of the snapshot file")
+    parser.add_argument("--update", action="store_true",
+                        help="write the current results as the new snapshot")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="number of worker processes (default: cpu count)")
+    parser.add_argument("-v", "--verbose", action="store_true",
+                        help="print the lunch heuristic each day took")
+    args = parser.parse_args()
+
+    logger.info(f"replaying menus in {args.directory}")
+    paths: List[str] = get_pdfs(args.directory)
+    if not paths:
+        print(f"no pdfs found in {args.directory}")
+        return 1
+
+    start: float = time.perf_counter()
+    results: List[Dict[str, object]] = replay(paths, args.directory, args.jobs)
+    print(f"replayed {len(paths)} files in {time.perf_counter() - start:.2f} s")
+    print()
+
+    failed: int = report(results, read_snapshot(args.snapshot), args.verbose)
+
+    if args.update:
+        write_snapshot(args.snapshot, results)
+        print(f"snapshot written to {args.snapshot}")
+        return 0
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
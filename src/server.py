@@ -0,0 +1,208 @@
+from typing import List, Tuple, Dict, Optional
+import os
+import sys
+import json
+import argparse
+import threading
+import datetime as dt
+from collections import defaultdict
+from functools import lru_cache
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+import pandas as pd
+
+from logger import logger
+from analyze import get_storage, get_storage_version, COURSES
+
+"""
+Small read only HTTP/JSON service over the storage. The storage is
+loaded once and kept in memory, computed responses are kept in a
+LRU cache. The storage is only read again when its version (see
+analyze.get_storage_version) changed.
+
+Endpoints (dates as YYYY-MM-DD):
+    /days?start=&end=       all days in the range (both optional)
+    /dishes?q=              days where q appears in any course
+    /weeks?start=&end=      summary per week in the range
+"""
+
+CACHE_SIZE: int = 256
+ENDPOINTS: Tuple[str, ...] = ("/days", "/dishes", "/weeks")
+
+
+class StorageSnapshot:
+    """
+    The storage as loaded at one version together with its dish index
+    and response cache. Never changed after creation, a reload creates
+    a new snapshot, so a request always sees consistent data.
+    """
+
+    def __init__(self) -> None:
+        self.version: Optional[Tuple[int, int, int]] = get_storage_version()
+        logger.info(f"loading storage for server, version={self.version}")
+        self.df: pd.DataFrame = get_storage().sort_index()
+
+        # lowercase dish -> dates it was served on
+        dishes: Dict[str, List[dt.date]] = defaultdict(list)
+        for date, row in self.df.iterrows():
+            for course in COURSES:
+                values: List[str] = row[course].split(";") if course == "main" else [row[course]]
+                for value in values:
+                    value = value.strip().lower()
+                    if value not in ("", "none"):
+                        dishes[value].append(date.date())
+        self.dishes: Dict[str, List[dt.date]] = dict(dishes)
+
+        # responses are computed from the in memory frame, cache them
+        # for the lifetime of this snapshot
+        self.response = lru_cache(maxsize=CACHE_SIZE)(self._compute)
+
+    def _compute(self, endpoint: str, params: Tuple[Tuple[str, str], ...]) -> bytes:
+        query: Dict[str, str] = dict(params)
+        if endpoint == "/days":
+            result: object = self.days(query.get("start"), query.get("end"))
+        elif endpoint == "/dishes":
+            q: str = query.get("q", "").strip()
+            if not q:
+                raise ValueError("missing parameter q")
+            result = self.dish(q)
+        else:
+            result = self.weeks(query.get("start"), query.get("end"))
+
+        return json.dumps(result, ensure_ascii=False).encode("utf-8")
+
+    def _range(self, start: Optional[str], end: Optional[str]) -> pd.DataFrame:
+        start_date: Optional[dt.datetime] = dt.datetime.strptime(
+            start, "%Y-%m-%d") if start else None
+        end_date: Optional[dt.datetime] = dt.datetime.strptime(
+            end, "%Y-%m-%d") if end else None
+        return self.df.loc[start_date:end_date]
+
+    @staticmethod
+    def _rows(df: pd.DataFrame) -> List[Dict[str, str]]:
+        return [{"date": date.strftime("%Y-%m-%d"), **row}
+                for date, row in zip(df.index, df.to_dict("records"))]
+
+    def days(self, start: Optional[str], end: Optional[str]) -> List[Dict[str, str]]:
+        return self._rows(self._range(start, end))
+
+    def dish(self, q: str) -> List[Dict[str, str]]:
+        q = q.strip().lower()
+        dates: List[dt.date] = sorted({date for dish, dates in self.dishes.items()
+                                       if q in dish for date in dates})
+        return self._rows(self.df.loc[pd.to_datetime(dates)])
+
+    def weeks(self, start: Optional[str], end: Optional[str]) -> List[Dict[str, object]]:
+        df: pd.DataFrame = self._range(start, end)
+        mondays: pd.DatetimeIndex = df.index.normalize() - \
+            pd.to_timedelta(df.index.weekday, unit="D")
+
+        summary: List[Dict[str, object]] = []
+        for monday, days in df.groupby(mondays):
+            served: pd.DataFrame = days[days["soup"] != "none"]
+            summary.append({
+                "week": monday.strftime("%Y-%m-%d"),
+                "days": len(days),
+                "days_served": len(served),
+                "soups": list(served["soup"]),
+                "mains": [main for mains in served["main"] for main in mains.split(";")],
+                "desserts": list(served["dessert"]),
+                "dinners": list(served["dinner"]),
+            })
+
+        return summary
+
+
+class StorageCache:
+    """
+    Holds the current StorageSnapshot and replaces it when the
+    storage file changed.
+    """
+
+    def __init__(self) -> None:
+        self._lock: threading.Lock = threading.Lock()
+        self.snapshot: StorageSnapshot = StorageSnapshot()
+
+    def current(self) -> StorageSnapshot:
+        """
+        Returns the snapshot to use for a request, reloading the
+        storage first if the file changed since it was loaded.
+        """
+        snapshot: StorageSnapshot = self.snapshot
+        if get_storage_version() == snapshot.version:
+            return snapshot
+
+        with self._lock:
+            if get_storage_version() != self.snapshot.version:
+                self.snapshot = StorageSnapshot()
+            return self.snapshot
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    # set by make_server
+    cache: StorageCache
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        params: Tuple[Tuple[str, str], ...] = tuple(sorted(
+            (key, values[-1]) for key, values in parse_qs(url.query).items()))
+
+        if url.path not in ENDPOINTS:
+            self._send(404, {"error": f"unknown endpoint {url.path}"})
+            return
+
+        snapshot: StorageSnapshot = self.cache.current()
+        try:
+            body: bytes = snapshot.response(url.path, params)
+        except ValueError as e:
+            self._send(400, {"error": str(e)})
+            return
+
+        self._send(200, body)
+
+    def _send(self, status: int, body: object) -> None:
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode("utf-8")
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        logger.debug(f"{self.address_string()} {format % args}")
+
+
+def make_server(host: str = "127.0.0.1", port: int = 8000) -> ThreadingHTTPServer:
+    """
+    Creates the server (not started yet). Use port 0 to get a free port,
+    the actual one is in server.server_address.
+    """
+    handler = type("Handler", (RequestHandler,), {"cache": StorageCache()})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Serve the menu storage as JSON.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    server: ThreadingHTTPServer = make_server(args.host, args.port)
+    host, port = server.server_address[:2]
+    print(f"serving storage on http://{host}:{port}")
+    logger.info(f"serving storage on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
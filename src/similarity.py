@@ -0,0 +1,300 @@
+from typing import List, Tuple, Dict, Optional
+import os
+import sys
+import re
+import json
+import hashlib
+import argparse
+import datetime as dt
+from collections import Counter
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from logger import logger
+from analyze import get_storage, COURSES
+
+"""
+Similar week search over the whole menu history. Each week is
+stored as a sparse vector of the words of its soups, main courses,
+desserts and dinners (weighted with tf-idf), so "which weeks looked
+like this one" is a single sparse matrix product over all weeks.
+The index is saved in the analysis folder and only the weeks that
+are new, changed or removed are touched on update.
+"""
+
+INDEX_PATH: str = os.path.realpath(os.path.join(
+    os.path.dirname(__file__), "..", "analysis", "week-index.npz"))
+
+
+def tokenize(course: str, text: str) -> List[str]:
+    """
+    Splits the text of a course into lowercase words prefixed
+    with the course, so "soup:gulasch" and "main:gulasch" differ.
+    """
+    if not isinstance(text, str) or text == "none":
+        return []
+
+    return [f"{course}:{word}" for word in re.findall(r"\w{3,}", text.lower())]
+
+
+def week_start(dates: pd.DatetimeIndex) -> pd.DatetimeIndex:
+    """
+    Returns the monday of the week of each date.
+    """
+    return dates.normalize() - pd.to_timedelta(dates.weekday, unit="D")
+
+
+class WeekIndex:
+    def __init__(self) -> None:
+        self.vocabulary: Dict[str, int] = {}
+        # mondays of the indexed weeks, row i of the matrix is weeks[i]
+        self.weeks: List[pd.Timestamp] = []
+        # fingerprint of the content of each week, to detect changes
+        self.fingerprints: Dict[pd.Timestamp, str] = {}
+        self._counts: sp.csr_matrix = sp.csr_matrix((0, 0), dtype=np.float64)
+        self._matrix: Optional[sp.csr_matrix] = None
+
+    def __len__(self) -> int:
+        return len(self.weeks)
+
+    def update(self, df: pd.DataFrame) -> int:
+        """
+        Adds the weeks of the storage frame that are not indexed yet
+        or whose days changed and drops the weeks that are no longer
+        in it. Returns the number of added, changed and removed weeks.
+        """
+        starts: pd.DatetimeIndex = week_start(pd.DatetimeIndex(df.index))
+        present = set(starts)
+        removed: List[pd.Timestamp] = [
+            week for week in self.weeks if week not in present]
+        for week in removed:
+            del self.fingerprints[week]
+
+        changed: List[pd.Timestamp] = []
+        documents: List[Counter] = []
+        for week, days in df.groupby(starts):
+            text: List[Tuple[str, str]] = [
+                (course, value) for course in COURSES for value in days[course]]
+            fingerprint: str = hashlib.sha1(
+                repr(text).encode("utf-8")).hexdigest()
+            if self.fingerprints.get(week) == fingerprint:
+                continue
+
+            document: Counter = Counter()
+            for course, value in text:
+                document.update(tokenize(course, value))
+
+            changed.append(week)
+            documents.append(document)
+            self.fingerprints[week] = fingerprint
+
+        if not changed and not removed:
+            return 0
+
+        logger.debug(
+            f"indexing {len(changed)} weeks, removing {len(removed)} weeks")
+
+        # build the new rows in coo format, growing the vocabulary
+        rows: List[int] = []
+        cols: List[int] = []
+        values: List[float] = []
+        for row, document in enumerate(documents):
+            for token, count in document.items():
+                rows.append(row)
+                cols.append(self.vocabulary.setdefault(
+                    token, len(self.vocabulary)))
+                values.append(count)
+
+        new_counts: sp.csr_matrix = sp.csr_matrix(
+            (values, (rows, cols)), shape=(len(changed), len(self.vocabulary)),
+            dtype=np.float64)
+
+        # drop the old rows of changed and removed weeks, widen the old
+        # matrix to the grown vocabulary and append the new rows
+        dropped = set(changed) | set(removed)
+        keep: List[int] = [i for i, week in enumerate(self.weeks)
+                           if week not in dropped]
+        old_counts: sp.csr_matrix = self._counts[keep]
+        old_counts.resize((len(keep), len(self.vocabulary)))
+
+        self._counts = sp.vstack([old_counts, new_counts], format="csr")
+        self.weeks = [self.weeks[i] for i in keep] + changed
+        self._matrix = None
+
+        return len(changed) + len(removed)
+
+    @property
+    def matrix(self) -> sp.csr_matrix:
+        """
+        The l2 normalized tf-idf matrix, one row per week.
+        Computed from the raw counts after every update.
+        """
+        if self._matrix is None:
+            n_weeks: int = self._counts.shape[0]
+            document_frequency: np.ndarray = np.bincount(
+                self._counts.indices, minlength=self._counts.shape[1])
+            idf: np.ndarray = np.log(
+                (1 + n_weeks) / (1 + document_frequency)) + 1
+
+            matrix: sp.csr_matrix = sp.csr_matrix(self._counts.multiply(idf))
+            norms: np.ndarray = np.sqrt(
+                np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+            norms[norms == 0] = 1
+            self._matrix = sp.csr_matrix(sp.diags(1 / norms) @ matrix)
+
+        return self._matrix
+
+    def most_similar(self, weeks: List[pd.Timestamp], k: int = 5) \
+            -> Dict[pd.Timestamp, List[Tuple[pd.Timestamp, float]]]:
+        """
+        Returns the k most similar weeks (cosine similarity) for each of
+        the given weeks, best first. All weeks are scored at once.
+        """
+        positions: Dict[pd.Timestamp, int] = {
+            week: i for i, week in enumerate(self.weeks)}
+        rows: List[int] = [positions[week] for week in weeks]
+        if not rows:
+            return {}
+
+        matrix: sp.csr_matrix = self.matrix
+        scores: np.ndarray = (matrix[rows] @ matrix.T).toarray()
+        # a week is not similar to itself
+        scores[np.arange(len(rows)), rows] = -np.inf
+
+        k = min(k, len(self.weeks) - 1)
+        if k <= 0:
+            return {week: [] for week in weeks}
+
+        top: np.ndarray = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        result: Dict[pd.Timestamp, List[Tuple[pd.Timestamp, float]]] = {}
+        for i, week in enumerate(weeks):
+            best: np.ndarray = top[i][np.argsort(-scores[i, top[i]])]
+            result[week] = [(self.weeks[j], float(scores[i, j])) for j in best]
+
+        return result
+
+    def save(self, path: str = INDEX_PATH) -> None:
+        """
+        Saves the index as npz (counts) with a json file next to it
+        holding the vocabulary, weeks and fingerprints.
+        """
+        tmp_path: str = path + ".tmp.npz"
+        sp.save_npz(tmp_path, self._counts)
+        os.replace(tmp_path, path)
+
+        meta: Dict[str, object] = {
+            "vocabulary": self.vocabulary,
+            "weeks": [week.strftime("%Y-%m-%d") for week in self.weeks],
+            "fingerprints": {week.strftime("%Y-%m-%d"): fingerprint
+                             for week, fingerprint in self.fingerprints.items()},
+        }
+        with open(path + ".json.tmp", "w", encoding="utf-8") as file:
+            json.dump(meta, file, ensure_ascii=False)
+        os.replace(path + ".json.tmp", path + ".json")
+
+    @staticmethod
+    def load(path: str = INDEX_PATH) -> "WeekIndex":
+        """
+        Loads an index saved with save, returns an empty index
+        if there is none yet or if the matrix and the json file do
+        not belong together (e.g. a crash between writing them), so
+        the next update rebuilds it from scratch.
+        """
+        index: WeekIndex = WeekIndex()
+        if not (os.path.exists(path) and os.path.exists(path + ".json")):
+            logger.debug("no week index stored yet")
+            return index
+
+        with open(path + ".json", "r", encoding="utf-8") as file:
+            meta: Dict = json.load(file)
+
+        counts: sp.csr_matrix = sp.load_npz(path).tocsr()
+        if counts.shape != (len(meta["weeks"]), len(meta["vocabulary"])) \
+                or set(meta["weeks"]) != set(meta["fingerprints"]):
+            logger.warning(
+                f"week index files do not match (matrix {counts.shape}, "
+                f"{len(meta['weeks'])} weeks, {len(meta['vocabulary'])} words), rebuilding")
+            return index
+
+        index._counts = counts
+        index.vocabulary = meta["vocabulary"]
+        index.weeks = [pd.Timestamp(week) for week in meta["weeks"]]
+        index.fingerprints = {pd.Timestamp(week): fingerprint
+                              for week, fingerprint in meta["fingerprints"].items()}
+
+        return index
+
+
+def following_dishes(df: pd.DataFrame, dish: str, k: int = 10) -> List[Tuple[str, int]]:
+    """
+    Returns the k main courses that were served most often on the
+    next school day (monday after a friday) after a day where dish was
+    on the menu (in any course). Days without lunch are left out and
+    pairs across holidays or such days are not counted.
+    """
+    df = df.sort_index()
+    df = df[df["main"] != "none"]
+    mask: pd.Series = pd.Series(False, index=df.index)
+    for course in COURSES:
+        mask |= df[course].str.contains(dish, case=False, regex=False, na=False)
+
+    dates: pd.DatetimeIndex = pd.DatetimeIndex(df.index).normalize()
+    next_school_day: pd.DatetimeIndex = dates + pd.to_timedelta(
+        np.where(dates.weekday == 4, 3, 1), unit="D")
+    next_served: pd.Series = pd.Series(dates, index=df.index).shift(-1)
+    mask &= next_served == pd.Series(next_school_day, index=df.index)
+
+    following: pd.Series = df["main"].shift(-1)[mask].dropna()
+    counter: Counter = Counter(
+        main.strip() for mains in following for main in mains.split(";")
+        if main.strip() not in ("", "none"))
+
+    return counter.most_common(k)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Find similar weeks in the menu history.")
+    parser.add_argument("date", nargs="?", default=None,
+                        help="a day of the week to compare (YYYY-MM-DD, default: latest week)")
+    parser.add_argument("-k", type=int, default=5,
+                        help="number of weeks to show")
+    parser.add_argument("--follows", metavar="DISH", default=None,
+                        help="show what is usually served the school day after DISH")
+    args = parser.parse_args()
+
+    df: pd.DataFrame = get_storage()
+
+    if args.follows is not None:
+        for main_course, count in following_dishes(df, args.follows, args.k):
+            print(f"{count:4}  {main_course}")
+        return 0
+
+    index: WeekIndex = WeekIndex.load()
+    if (updated := index.update(df)):
+        logger.info(f"{updated} weeks updated in the week index")
+        index.save()
+
+    if not len(index):
+        print("no weeks in storage yet")
+        return 1
+
+    if args.date is None:
+        week: pd.Timestamp = max(index.weeks)
+    else:
+        week = week_start(pd.DatetimeIndex(
+            [dt.datetime.strptime(args.date, "%Y-%m-%d")]))[0]
+        if week not in index.weeks:
+            print(f"week of {args.date} is not in storage")
+            return 1
+
+    print(f"weeks most similar to {week.strftime('%d-%m-%Y')}:")
+    for similar, score in index.most_similar([week], args.k)[week]:
+        print(f"  {similar.strftime('%d-%m-%Y')}  {score:.3f}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())